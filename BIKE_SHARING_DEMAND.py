@@ -11,42 +11,59 @@
 
 ################################################################
 
+import os
 import pandas as pd
 import numpy as np
+import polars as pl
 from scipy import stats
 import matplotlib
+
+# Exploratory plots are only drawn when EDA is set to 1/true/yes/on, otherwise figures render off-screen
+EDA = os.environ.get('EDA', '').strip().lower() in {'1', 'true', 'yes', 'on'}
+matplotlib.use('TkAgg' if EDA else 'Agg')
+
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
 import seaborn as sns
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import RandomizedSearchCV, train_test_split
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
+from sklearn.base import clone
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.multioutput import MultiOutputRegressor
 from sklearn.metrics import make_scorer, mean_squared_log_error, mean_squared_error
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LinearRegression
+import sklearn
+import xgboost
+from joblib import Memory
+from numba import njit
 from xgboost import XGBRegressor
-matplotlib.use('TkAgg')
+import optuna
 
 # Load Data
 train_path = "datasets/train_bike.csv"
 test_path = "datasets/test_bike.csv"
 
-train_df = pd.read_csv(train_path)
-test_df = pd.read_csv(test_path)
+# Declaring the column dtypes up front skips type inference, pyarrow parses the files in parallel
+feature_dtypes = {'season': 'int8', 'holiday': 'int8', 'workingday': 'int8', 'weather': 'int8',
+                  'temp': 'float32', 'atemp': 'float32', 'humidity': 'int8', 'windspeed': 'float32'}
+target_dtypes = {'casual': 'int32', 'registered': 'int32', 'count': 'int32'}
 
-train_df['data_set'] = 'train'
-test_df['data_set'] = 'test'
+train_df = pd.read_csv(train_path, dtype={**feature_dtypes, **target_dtypes}, parse_dates=['datetime'],
+                       engine='pyarrow')
+test_df = pd.read_csv(test_path, dtype=feature_dtypes, parse_dates=['datetime'], engine='pyarrow')
+
+train_df['is_train'] = True
+test_df['is_train'] = False
 
 test_df['registered'] = 0
 test_df['casual'] = 0
 test_df['count'] = 0
 
 all_df = pd.concat([train_df, test_df])
+all_df['is_train'] = all_df['is_train'].astype(bool)
 
 
-train_df.info()
-test_df.info()
-
-train_df.describe().T
-
 # Understand the distribution of numerical variables and generate a frequency table for numeric variables
 def plot_histograms(dataframe):
     """
@@ -96,10 +113,15 @@ def plot_histograms(dataframe):
     plt.show()
 
 
-plot_histograms(all_df)
+if EDA:
+    train_df.info()
+    test_df.info()
 
+    train_df.describe().T
 
-all_df.isnull().sum() # check how many columns have null variables
+    plot_histograms(all_df)
+
+    all_df.isnull().sum() # check how many columns have null variables
 
 
 # Feature Engineering
@@ -110,13 +132,11 @@ all_df.isnull().sum() # check how many columns have null variables
 # Additional features like weather categories, interaction terms, and rolling means are also created to
 # capture important patterns for the model.
 
-dt = pd.DatetimeIndex(all_df['datetime']) #set the column to a DateTime index object
-all_df['datetime'] = dt # update datetime column with the object
-all_df.set_index(dt, inplace=True) # set it as index
+all_df.set_index('datetime', drop=False, inplace=True) # datetime is parsed on load, use it as the index
 
 # Log transformation to stabilize variance
 for col in ['casual', 'registered', 'count']:
-    all_df['%s_log' % col] = np.log(all_df[col] + 1)
+    all_df['%s_log' % col] = np.log1p(all_df[col])
 
 # Datetime feature extraction
 all_df['hour'] = all_df.index.hour
@@ -126,26 +146,40 @@ all_df['year'] = all_df.index.year
 all_df['dow'] = all_df.index.dayofweek
 
 # Interpolation of missing values
-all_df["weather"] = all_df["weather"].interpolate(method='time').apply(np.round)
-all_df["temp"] = all_df["temp"].interpolate(method='time')
-all_df["atemp"] = all_df["atemp"].interpolate(method='time')
-all_df["humidity"] = all_df["humidity"].interpolate(method='time').apply(np.round)
-all_df["windspeed"] = all_df["windspeed"].interpolate(method='time')
+interp_cols = ["weather", "temp", "atemp", "humidity", "windspeed"]
+all_df[interp_cols] = all_df[interp_cols].interpolate(method='time')
+all_df[["weather", "humidity"]] = all_df[["weather", "humidity"]].round()
+
 
 # Correlations
-plt.figure(figsize=(20, 12))
-heatmap = sns.heatmap(train_df.corr(), annot=True, annot_kws={"size": 12}, cmap='coolwarm', linewidths=.5)
-heatmap.set_xticklabels(heatmap.get_xticklabels(), rotation=45, horizontalalignment='right')
-heatmap.set_yticklabels(heatmap.get_yticklabels(), rotation=0)
-plt.show()
+def plot_correlations(dataframe):
+    """
+        Plots the correlation heatmap and a pairplot of the numerical columns in the dataframe.
+        The pairplot is drawn on a 2000-row sample to keep it fast.
 
-plt.figure(figsize=(16,8))
-sns.pairplot(train_df)
+        Parameters:
+        dataframe (pandas.DataFrame): The dataframe containing the data to plot.
+
+        Returns:
+        None: Displays the plots using matplotlib.
+        """
+    plt.figure(figsize=(20, 12))
+    heatmap = sns.heatmap(dataframe.corr(numeric_only=True), annot=True, annot_kws={"size": 12}, cmap='coolwarm',
+                          linewidths=.5)
+    heatmap.set_xticklabels(heatmap.get_xticklabels(), rotation=45, horizontalalignment='right')
+    heatmap.set_yticklabels(heatmap.get_yticklabels(), rotation=0)
+    plt.show()
+
+    plt.figure(figsize=(16,8))
+    sns.pairplot(dataframe.sample(min(2000, len(dataframe)), random_state=0))
+
+
+if EDA:
+    plot_correlations(train_df)
 
 # Aggregation and custom features
-by_season = all_df[all_df['data_set'] == 'train'].copy().groupby(['season'])[['count']].agg(sum)
-by_season.columns = ['count_season']
-all_df = all_df.join(by_season, on='season')
+season_sum = all_df.loc[all_df['is_train']].groupby('season')['count'].sum()
+all_df['count_season'] = all_df['season'].map(season_sum).astype('float32')
 
 # Analyse target variable
 def target_summary(dataframe, target, categorical_col):
@@ -154,91 +188,129 @@ def target_summary(dataframe, target, categorical_col):
 
        Parameters:
        dataframe (pandas.DataFrame): The dataframe containing the data.
-       target (str): The target variable to summarize.
+       target (str or numpy.ndarray): The target variable to summarize, or its precomputed values.
        categorical_col (str): The categorical column to group by.
 
        Returns:
        None: Prints the grouped target mean summary.
        """
-    print(pd.DataFrame({"TARGET_MEAN": dataframe.groupby(categorical_col)[target].mean()}), end="\n\n\n")
-for col in train_df.columns:
-    target_summary(train_df,"count",col)
-train_df["count"].hist(bins=100)
-plt.show() # Histogram ("count" is divided to 100 equal parts)
-# Positively(right) skewed data
-
-by_hour = all_df[all_df['data_set'] == 'train'].copy().groupby(['hour', 'workingday'])['count'].agg('sum').unstack()
-by_hour.head(10)
-# rentals by hour, split by working day (or not)
-by_hour.plot(kind='bar', figsize=(15,5), width=0.8);
-plt.grid(True)
-plt.tight_layout()
-
-train_df = all_df[all_df['data_set'] == 'train'].copy()
-#train_df.boxplot(column='count', by='hour', figsize=(15,5))
-#plt.ylabel('Count of Users')
-#plt.title("Boxplot of Count grouped by hour")
-#plt.suptitle("") # get rid of the pandas autogenerated title
-
-fig, ax = plt.subplots(figsize=(18, 5))
-sns.boxplot(x=train_df['hour'], y=train_df['count'], ax=ax)
-ax.set_ylabel('Count of Users')
-ax.set_title("Boxplot of Count grouped by hour");
-plt.suptitle("") # get rid of the pandas autogenerated title
-
-season_map = {1:'Spring', 2:'Summer', 3:'Fall', 4:'Winter'}
-good_weather = all_df[all_df['weather'] == 1][['hour', 'season']].copy()
-data = pd.DataFrame({'count' : good_weather.groupby(["hour","season"]).size()}).reset_index()
-data['season'] = data['season'].map(lambda d : season_map[d])
-
-fig, ax = plt.subplots(figsize=(18, 5))
-sns.pointplot(x=data["hour"], y=data["count"], hue=data["season"], ax=ax)
-ax.set(xlabel='Hour Of The Day', ylabel='Good Weather Count', title="Good Weather By Hour Of The Day Across Season")
-
-fig, ax = plt.subplots(figsize=(12, 5))
-data.plot.area(stacked=False, ax=ax)
-ax.set(xlabel='Hour Of The Day', ylabel='Normal Weather Count', title="Normal Weather By Hour Of The Day Across Season")
-
-weather_map = {1:'Good', 2:'Normal', 3:'Bad', 4:'Worse'}
-data = pd.DataFrame(train_df.groupby(["hour","weather"], sort=True)["count"].mean()).reset_index()
-data['weather'] = data['weather'].map(lambda d : weather_map[d])
-fig, ax = plt.subplots(figsize=(18, 5))
-sns.pointplot(x=data["hour"], y=data["count"], hue=data["weather"], ax=ax)
-ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title="Average Users Count By Hour Of The Day Across Weather")
-
-season_map = {1:'Spring', 2:'Summer', 3:'Fall', 4:'Winter'}
-data = pd.DataFrame({'mean':train_df.groupby(["hour","season"], sort=True)["count"].mean()}).reset_index()
-data['season'] = data['season'].map(lambda d : season_map[d])
-fig, ax = plt.subplots(figsize=(18, 5))
-sns.pointplot(x=data["hour"], y=data["mean"], hue=data["season"], ax=ax)
-ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title="Average Users Count By Hour Of The Day Across Season")
-
-day_map = {0:'Monday', 1:'Tuesday', 2:'Wednesday', 3:'Thursday', 4:'Friday', 5:'Saturday', 6:'Sunday'}
-hueOrder = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-data = pd.DataFrame({'mean':train_df.groupby(["hour","dow"], sort=True)["count"].mean()}).reset_index()
-data['dow'] = data['dow'].map(lambda d : day_map[d])
-fig, ax = plt.subplots(figsize=(18, 5))
-sns.pointplot(x=data["hour"], y=data["mean"], hue=data["dow"], hue_order=hueOrder, ax=ax)
-ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title="Average Users Count By Hour Of The Day Across Weekdays")
-
-# Registered and casual user rent difference
-fig, axs = plt.subplots(1, 2, figsize=(18,5), sharex=False, sharey=False)
-
-sns.boxplot(x='hour', y='casual', data=train_df, ax=axs[0])
-axs[0].set_ylabel('casual users')
-axs[0].set_title('')
-
-sns.boxplot(x='hour', y='registered', data=train_df, ax=axs[1])
-axs[1].set_ylabel('registered users')
-axs[1].set_title('')
-
-fig, ax = plt.subplots(figsize=(18, 5))
-train_df_melt = pd.melt(train_df[["hour","casual","registered"]], id_vars=['hour'], value_vars=['casual', 'registered'], var_name='usertype', value_name='count')
-data = pd.DataFrame(train_df_melt.groupby(["hour", "usertype"], sort=True)["count"].mean()).reset_index()
-sns.pointplot(x=data["hour"], y=data["count"], hue=data["usertype"], hue_order=["casual","registered"], ax=ax)
-ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title='Average Users Count By Hour Of The Day Across User Type')
+    target_values = dataframe[target].to_numpy() if isinstance(target, str) else target
+    target_mean = pd.Series(target_values).groupby(dataframe[categorical_col].to_numpy()).mean()
+    print(target_mean.rename_axis(categorical_col).to_frame("TARGET_MEAN"), end="\n\n\n")
+
+
+# Labels for the coded columns, in code order
+SEASONS = ['Spring', 'Summer', 'Fall', 'Winter']
+WEATHERS = ['Good', 'Normal', 'Bad', 'Worse']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def to_labels(codes, labels, first_code=0):
+    """
+        Converts integer codes to a categorical of their labels without a per-row lookup.
+
+        Parameters:
+        codes (array-like): The integer codes, for example season or dow values.
+        labels (list): The label for each code, in code order.
+        first_code (int): The code of the first label.
+
+        Returns:
+        pandas.Categorical: The labels, stored as int8 codes.
+        """
+    return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int8) - first_code, categories=labels)
+
+
+def plot_hourly_demand(train_data, all_data):
+    """
+        Plots rentals by hour of the day, split by working day, season, weather, weekday and user type.
+
+        Parameters:
+        train_data (pandas.DataFrame): The feature-engineered training rows.
+        all_data (pandas.DataFrame): The feature-engineered training and test rows.
+
+        Returns:
+        None: Displays the plots using matplotlib.
+        """
+    # Grouped statistics for the plots below, collected together from one set of Polars lazy queries
+    train_pl = pl.from_pandas(train_data[['hour', 'workingday', 'season', 'weather', 'dow', 'count',
+                                          'casual', 'registered']]).lazy()
+    good_weather_pl = pl.from_pandas(all_data.loc[all_data['weather'] == 1, ['hour', 'season']]).lazy()
+    by_hour, good_weather_counts, weather_means, season_means, dow_means, usertype_means = (
+        frame.to_pandas() for frame in pl.collect_all([
+            train_pl.group_by(['hour', 'workingday']).agg(pl.col('count').sum()),
+            good_weather_pl.group_by(['hour', 'season']).agg(pl.len().alias('count')).sort(['hour', 'season']),
+            train_pl.group_by(['hour', 'weather']).agg(pl.col('count').mean()).sort(['hour', 'weather']),
+            train_pl.group_by(['hour', 'season']).agg(pl.col('count').mean().alias('mean')).sort(['hour', 'season']),
+            train_pl.group_by(['hour', 'dow']).agg(pl.col('count').mean().alias('mean')).sort(['hour', 'dow']),
+            train_pl.select(['hour', 'casual', 'registered'])
+            .unpivot(index='hour', on=['casual', 'registered'], variable_name='usertype', value_name='count')
+            .group_by(['hour', 'usertype']).agg(pl.col('count').mean()).sort(['hour', 'usertype'])
+        ]))
+
+    by_hour = by_hour.pivot(index='hour', columns='workingday', values='count').sort_index()
+    by_hour.head(10)
+    # rentals by hour, split by working day (or not)
+    by_hour.plot(kind='bar', figsize=(15,5), width=0.8);
+    plt.grid(True)
+    plt.tight_layout()
+
+    #train_data.boxplot(column='count', by='hour', figsize=(15,5))
+    #plt.ylabel('Count of Users')
+    #plt.title("Boxplot of Count grouped by hour")
+    #plt.suptitle("") # get rid of the pandas autogenerated title
+
+    fig, ax = plt.subplots(figsize=(18, 5))
+    sns.boxplot(x=train_data['hour'], y=train_data['count'], ax=ax)
+    ax.set_ylabel('Count of Users')
+    ax.set_title("Boxplot of Count grouped by hour");
+    plt.suptitle("") # get rid of the pandas autogenerated title
+
+    data = good_weather_counts
+    data['season'] = to_labels(data['season'], SEASONS, first_code=1)
+
+    fig, ax = plt.subplots(figsize=(18, 5))
+    sns.pointplot(x=data["hour"], y=data["count"], hue=data["season"], ax=ax)
+    ax.set(xlabel='Hour Of The Day', ylabel='Good Weather Count', title="Good Weather By Hour Of The Day Across Season")
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    data.plot.area(stacked=False, ax=ax)
+    ax.set(xlabel='Hour Of The Day', ylabel='Normal Weather Count', title="Normal Weather By Hour Of The Day Across Season")
+
+    data = weather_means
+    data['weather'] = to_labels(data['weather'], WEATHERS, first_code=1)
+    fig, ax = plt.subplots(figsize=(18, 5))
+    sns.pointplot(x=data["hour"], y=data["count"], hue=data["weather"], ax=ax)
+    ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title="Average Users Count By Hour Of The Day Across Weather")
+
+    data = season_means
+    data['season'] = to_labels(data['season'], SEASONS, first_code=1)
+    fig, ax = plt.subplots(figsize=(18, 5))
+    sns.pointplot(x=data["hour"], y=data["mean"], hue=data["season"], ax=ax)
+    ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title="Average Users Count By Hour Of The Day Across Season")
+
+    hueOrder = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+    data = dow_means
+    data['dow'] = to_labels(data['dow'], WEEKDAYS)
+    fig, ax = plt.subplots(figsize=(18, 5))
+    sns.pointplot(x=data["hour"], y=data["mean"], hue=data["dow"], hue_order=hueOrder, ax=ax)
+    ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title="Average Users Count By Hour Of The Day Across Weekdays")
+
+    # Registered and casual user rent difference
+    fig, axs = plt.subplots(1, 2, figsize=(18,5), sharex=False, sharey=False)
+
+    sns.boxplot(x='hour', y='casual', data=train_data, ax=axs[0])
+    axs[0].set_ylabel('casual users')
+    axs[0].set_title('')
+
+    sns.boxplot(x='hour', y='registered', data=train_data, ax=axs[1])
+    axs[1].set_ylabel('registered users')
+    axs[1].set_title('')
+
+    fig, ax = plt.subplots(figsize=(18, 5))
+    data = usertype_means
+    sns.pointplot(x=data["hour"], y=data["count"], hue=data["usertype"], hue_order=["casual","registered"], ax=ax)
+    ax.set(xlabel='Hour Of The Day', ylabel='Users Count', title='Average Users Count By Hour Of The Day Across User Type')
 
-import matplotlib.colors as mcolors
 
 # Function to add jitter to the hour value
 def hour_jitter(hour):
@@ -248,129 +320,196 @@ def hour_jitter(hour):
 def hour_format(hour):
     return f"{hour:02d}:00 AM" if hour <= 12 else f"{hour % 12:02d}:00 PM"
 
-# Set up a color map for the scatter plot
-color_map = mcolors.ListedColormap([
-    "#5e4fa2", "#3288bd", "#66c2a5", "#abdda4",
-    "#e6f598", "#fee08b", "#fdae61", "#f46d43",
-    "#d53e4f", "#9e0142"
-])
-
-# Apply jitter to the 'hour' column
-train_df['hour_jitter'] = train_df['hour'].map(hour_jitter)
-
-# Create a scatter plot for working days with temperature as the color
-train_df[train_df['workingday'] == 1].plot(
-    kind="scatter",
-    x='hour_jitter',
-    y='count',
-    figsize=(18, 6),
-    c='temp',
-    cmap=color_map,
-    colorbar=True,
-    sharex=False
-)
-
-# Format the x-axis labels to show the hours
-hours = np.unique(train_df['hour'])
-hour_labels = [hour_format(h) for h in hours]
-plt.xticks(hours, hour_labels, rotation='vertical')
-
-plt.show()
-train_df.drop('hour_jitter', axis=1, inplace=True)
-
-# Daily trend
-dayOfWeek={0:'Monday', 1:'Tuesday', 2:'Wednesday', 3:'Thursday', 4:'Friday', 5:'Saturday', 6:'Sunday'}
-all_df['weekday'] = all_df['dow'].map(dayOfWeek)
-
-fig, axs = plt.subplots(1, 2, figsize=(15,5), sharex=False, sharey=False)
-
-sns.boxplot(x='weekday', y='registered', data=all_df, ax=axs[0])
-axs[0].set_ylabel('registered users')
-axs[0].set_title('')
-
-sns.boxplot(x='weekday', y='casual', data=all_df, ax=axs[1])
-axs[1].set_ylabel('casual users')
-axs[1].set_title('')
-
-all_df.drop('weekday', axis=1, inplace=True)
-
-# Weather boxplot
-fig, axs = plt.subplots(1, 2, figsize=(15,5), sharex=False, sharey=False)
-
-sns.boxplot(x='weather', y='registered', data=all_df, ax=axs[0])
-axs[0].set_ylabel('registered users')
-axs[0].set_title('')
-
-sns.boxplot(x='weather', y='casual', data=all_df, ax=axs[1])
-axs[1].set_ylabel('casual users')
-axs[1].set_title('')
-
-
-# Compare the distribution of train and test data
-# Compare seasons
-season_map = {1:'Spring', 2:'Summer', 3:'Fall', 4:'Winter'}
-data = all_df[['data_set', 'season']].copy()
-data['season'] = data['season'].map(lambda d : season_map[d])
-sns.countplot(x="data_set", hue="season", data=data)
-# compare by year
-plt.figure(figsize=(8, 5))
-sns.boxplot(x='year', y='count', data=train_df)
-plt.ylabel('Count of Users')
-plt.title("Boxplot of Count grouped by year")
 
-# Feature Engineering
-def get_day(day_start):
+def plot_working_day_scatter(train_data):
     """
-       Generates a range of hourly timestamps for a specific day, starting from the provided day.
+        Plots a jittered scatter of working day rentals by hour, colored by temperature.
 
-       Parameters:
-       day_start (pandas.Timestamp or datetime-like): The start date of the day to generate timestamps for.
+        Parameters:
+        train_data (pandas.DataFrame): The feature-engineered training rows.
 
-       Returns:
-       pandas.DatetimeIndex: A range of hourly timestamps for the specified day.
-       """
-    day_end = day_start + pd.offsets.DateOffset(hours=23)
-    return pd.date_range(day_start, day_end, freq="H")
-
-# Define special days
-all_df.loc[get_day(pd.datetime(2011, 4, 15)), "workingday"] = 1 #tax day
-all_df.loc[get_day(pd.datetime(2012, 4, 16)), "workingday"] = 1
-all_df.loc[get_day(pd.datetime(2011, 11, 25)), "workingday"] = 0
-all_df.loc[get_day(pd.datetime(2012, 11, 23)), "workingday"] = 0
-all_df.loc[get_day(pd.datetime(2011, 4, 15)), "holiday"] = 0
-all_df.loc[get_day(pd.datetime(2012, 4, 16)), "holiday"] = 0
-all_df.loc[get_day(pd.datetime(2011, 11, 25)), "holiday"] = 1
-all_df.loc[get_day(pd.datetime(2012, 11, 23)), "holiday"] = 1
-all_df.loc[get_day(pd.datetime(2012, 5, 21)), "holiday"] = 1
-all_df.loc[get_day(pd.datetime(2012, 6, 1)), "holiday"] = 1
+        Returns:
+        None: Displays the plot using matplotlib.
+        """
+    # Set up a color map for the scatter plot
+    color_map = mcolors.ListedColormap([
+        "#5e4fa2", "#3288bd", "#66c2a5", "#abdda4",
+        "#e6f598", "#fee08b", "#fdae61", "#f46d43",
+        "#d53e4f", "#9e0142"
+    ])
+
+    # Apply jitter to the 'hour' column
+    working_days = train_data[train_data['workingday'] == 1].copy()
+    working_days['hour_jitter'] = working_days['hour'].map(hour_jitter)
+
+    # Create a scatter plot for working days with temperature as the color
+    working_days.plot(
+        kind="scatter",
+        x='hour_jitter',
+        y='count',
+        figsize=(18, 6),
+        c='temp',
+        cmap=color_map,
+        colorbar=True,
+        sharex=False
+    )
+
+    # Format the x-axis labels to show the hours
+    hours = np.unique(train_data['hour'])
+    hour_labels = [hour_format(h) for h in hours]
+    plt.xticks(hours, hour_labels, rotation='vertical')
+
+    plt.show()
+
+
+def plot_weekday_weather(all_data):
+    """
+        Plots registered and casual rentals by weekday and by weather.
+
+        Parameters:
+        all_data (pandas.DataFrame): The feature-engineered training and test rows.
+
+        Returns:
+        None: Displays the plots using matplotlib.
+        """
+    # Daily trend
+    data = all_data.assign(weekday=to_labels(all_data['dow'], WEEKDAYS))
+
+    fig, axs = plt.subplots(1, 2, figsize=(15,5), sharex=False, sharey=False)
+
+    sns.boxplot(x='weekday', y='registered', data=data, ax=axs[0])
+    axs[0].set_ylabel('registered users')
+    axs[0].set_title('')
+
+    sns.boxplot(x='weekday', y='casual', data=data, ax=axs[1])
+    axs[1].set_ylabel('casual users')
+    axs[1].set_title('')
+
+    # Weather boxplot
+    fig, axs = plt.subplots(1, 2, figsize=(15,5), sharex=False, sharey=False)
+
+    sns.boxplot(x='weather', y='registered', data=all_data, ax=axs[0])
+    axs[0].set_ylabel('registered users')
+    axs[0].set_title('')
+
+    sns.boxplot(x='weather', y='casual', data=all_data, ax=axs[1])
+    axs[1].set_ylabel('casual users')
+    axs[1].set_title('')
+
+
+def plot_train_test_distribution(train_data, all_data):
+    """
+        Compares the season distribution of the training and test rows and plots rentals by year.
+
+        Parameters:
+        train_data (pandas.DataFrame): The feature-engineered training rows.
+        all_data (pandas.DataFrame): The feature-engineered training and test rows.
+
+        Returns:
+        None: Displays the plots using matplotlib.
+        """
+    # Compare seasons
+    data = all_data[['is_train', 'season']].copy()
+    data['season'] = to_labels(data['season'], SEASONS, first_code=1)
+    ax = sns.countplot(x="is_train", hue="season", data=data, order=[True, False])
+    ax.set_xticks([0, 1])
+    ax.set_xticklabels(['train', 'test'])
+    ax.set_xlabel('data_set')
+    # compare by year
+    plt.figure(figsize=(8, 5))
+    sns.boxplot(x='year', y='count', data=train_data)
+    plt.ylabel('Count of Users')
+    plt.title("Boxplot of Count grouped by year")
+
+
+if EDA:
+    count_values = train_df["count"].to_numpy()
+    for col in train_df.columns:
+        target_summary(train_df, count_values, col)
+    train_df["count"].hist(bins=100)
+    plt.show() # Histogram ("count" is divided to 100 equal parts)
+    # Positively(right) skewed data
+
+    eda_train_df = all_df[all_df['is_train']]
+    plot_hourly_demand(eda_train_df, all_df)
+    plot_working_day_scatter(eda_train_df)
+    plot_weekday_weather(all_df)
+    # Compare the distribution of train and test data
+    plot_train_test_distribution(eda_train_df, all_df)
+
+# Feature Engineering
+# Define special days, matched against the calendar date of every row at once
+calendar_day = all_df.index.normalize()
+tax_days = pd.to_datetime(['2011-04-15', '2012-04-16'])
+thanksgiving_fridays = pd.to_datetime(['2011-11-25', '2012-11-23'])
+extra_holidays = pd.to_datetime(['2012-05-21', '2012-06-01'])
+
+all_df.loc[calendar_day.isin(tax_days), ['workingday', 'holiday']] = [1, 0]
+all_df.loc[calendar_day.isin(thanksgiving_fridays), ['workingday', 'holiday']] = [0, 1]
+all_df.loc[calendar_day.isin(extra_holidays), 'holiday'] = 1
 
 # Custom Features:
 # Additional features such as 'is_weekend', 'temp_category', 'humidity_category', etc., are created to better
 # capture relationships in the data. These features help the model distinguish between weekdays and weekends,
 # temperature ranges, and interaction effects between temperature and humidity.
 
-all_df['is_weekend'] = all_df['dow'].apply(lambda x: 1 if x >= 5 else 0)
-all_df['temp_category'] = all_df['temp'].apply(lambda x: 'low' if x < 10 else ('medium' if 10 <= x < 20 else 'high'))
-all_df['humidity_category'] = all_df['humidity'].apply(lambda x: 'low' if x < 30 else ('medium' if 30 <= x < 70 else 'high'))
-all_df['windspeed_category'] = all_df['windspeed'].apply(lambda x: 'low' if x < 10 else ('medium' if 10 <= x < 20 else 'high'))
-all_df['hour_category'] = all_df['hour'].apply(lambda x: 'night' if 0 <= x < 6 else ('morning' if 6 <= x < 12 else ('afternoon' if 12 <= x < 18 else 'evening')))
+@njit(cache=True, fastmath=True)
+def rolling_mean3(x, fill_value):
+    """
+       Computes the trailing 3-value rolling mean of an array in a single pass.
+
+       Parameters:
+       x (numpy.ndarray): The values to average.
+       fill_value (float): The value used for the first two positions, which lack a full window.
+
+       Returns:
+       numpy.ndarray: The rolling means, with the same dtype as x.
+       """
+    out = np.empty_like(x)
+    out[:2] = fill_value
+    for i in range(2, len(x)):
+        out[i] = (x[i] + x[i - 1] + x[i - 2]) * (1 / 3)
+    return out
+
+
+dow = all_df['dow'].to_numpy()
+hour = all_df['hour'].to_numpy()
+temp = all_df['temp'].to_numpy()
+humidity = all_df['humidity'].to_numpy()
+windspeed = all_df['windspeed'].to_numpy()
+workingday = all_df['workingday'].to_numpy()
+
+all_df['is_weekend'] = (dow >= 5).astype(np.int8)
+all_df['temp_category'] = np.select([temp < 10, temp < 20], ['low', 'medium'], default='high')
+all_df['humidity_category'] = np.select([humidity < 30, humidity < 70], ['low', 'medium'], default='high')
+all_df['windspeed_category'] = np.select([windspeed < 10, windspeed < 20], ['low', 'medium'], default='high')
+all_df['hour_category'] = np.select([hour < 6, hour < 12, hour < 18], ['night', 'morning', 'afternoon'],
+                                    default='evening')
 all_df['temp_humidity_interaction'] = all_df['temp'] * all_df['humidity']
 all_df['holiday_weekday_interaction'] = all_df['holiday'] * all_df['workingday']
-all_df['rolling_mean_temp'] = all_df['temp'].rolling(window=3).mean().fillna(all_df['temp'].mean())
-all_df['busy_hour'] = all_df[['hour', 'workingday']].apply(lambda df: 1 if (
-            (df['workingday'] == 1 and (df['hour'] == 8 or 17 <= df['hour'] <= 18)) or (
-                df['workingday'] == 0 and 10 <= df['workingday'] <= 19)) else 0, axis=1)
-all_df['ideal'] = all_df[['temp', 'windspeed']].apply(lambda df: 1 if (df['temp'] > 27 and df['windspeed'] < 30) else 0,
-                                                      axis=1)
-all_df['sticky'] = all_df[['humidity', 'workingday']].apply(
-    lambda df: 1 if (df['workingday'] == 1 and df['humidity'] >= 60) else 0, axis=1)
+all_df['rolling_mean_temp'] = rolling_mean3(all_df['temp'].to_numpy(dtype=np.float32), all_df['temp'].mean())
+# Busy hours: commute peaks on working days, daytime on non-working days
+all_df['busy_hour'] = (((workingday == 1) & ((hour == 8) | ((hour >= 17) & (hour <= 18)))) |
+                       ((workingday == 0) & (hour >= 10) & (hour <= 19))).astype(np.int8)
+all_df['ideal'] = ((temp > 27) & (windspeed < 30)).astype(np.int8)
+all_df['sticky'] = ((workingday == 1) & (humidity >= 60)).astype(np.int8)
+
+# Downcast features to the narrowest dtypes that hold them, halving the bytes streamed during training
+int8_cols = ['weather', 'season', 'holiday', 'workingday', 'hour', 'day', 'month', 'dow',
+             'is_weekend', 'busy_hour', 'ideal', 'sticky', 'holiday_weekday_interaction']
+all_df[int8_cols] = all_df[int8_cols].astype('int8')
+all_df['year'] = all_df['year'].astype('int16')
+float32_cols = ['temp', 'atemp', 'humidity', 'windspeed', 'rolling_mean_temp', 'temp_humidity_interaction']
+all_df[float32_cols] = all_df[float32_cols].astype('float32')
+category_cols = ['temp_category', 'humidity_category', 'windspeed_category', 'hour_category']
+all_df[category_cols] = all_df[category_cols].astype('category')
 
 # Split Data Back:
 # After feature engineering, the dataset is split back into the original training and test sets.
 # The 'train_df' and 'test_df' dataframes are used in the model training process.
 
-train_df = all_df[all_df['data_set'] == 'train']
-test_df = all_df[all_df['data_set'] == 'test']
+train_df = all_df[all_df['is_train']]
+test_df = all_df[~all_df['is_train']]
 
 
 # Helper functions
@@ -385,9 +524,8 @@ def get_rmsle(y_pred, y_actual):
         Returns:
         float: The calculated RMSLE score.
         """
-    diff = np.log(y_pred + 1) - np.log(y_actual + 1)
-    mean_error = np.square(diff).mean()
-    return np.sqrt(mean_error)
+    diff = np.log1p(y_pred) - np.log1p(y_actual)
+    return np.sqrt(np.mean(diff * diff))
 
 
 def custom_train_valid_split(data, cutoff_day=15):
@@ -401,14 +539,20 @@ def custom_train_valid_split(data, cutoff_day=15):
         Returns:
         tuple: Two dataframes (train, valid) corresponding to the training and validation sets.
         """
-    train = data[data['day'] <= cutoff_day]
-    valid = data[data['day'] > cutoff_day]
+    day = data['day'].to_numpy()
+    train = data.iloc[np.flatnonzero(day <= cutoff_day)]
+    valid = data.iloc[np.flatnonzero(day > cutoff_day)]
     return train, valid
 
 
+_prep_cache = {}
+
+
 def prep_train_data(data, input_cols):
     """
         Prepares the input data for training by separating the feature columns and target variables (registered, casual).
+        Results are memoized per (dataframe, input columns) pair, so repeated calls return the same arrays.
+        The cache holds a reference to each dataframe, so its id cannot be reused by another frame.
 
         Parameters:
         data (pandas.DataFrame): The dataframe containing the data.
@@ -417,10 +561,61 @@ def prep_train_data(data, input_cols):
         Returns:
         tuple: Arrays containing the feature matrix and the two target arrays (registered_log and casual_log).
         """
-    X = data[input_cols].values
-    y_r = data['registered_log'].values
-    y_c = data['casual_log'].values
-    return X, y_r, y_c
+    key = (id(data), tuple(input_cols))
+    if key not in _prep_cache:
+        X = data[input_cols].values
+        y_r = data['registered_log'].values
+        y_c = data['casual_log'].values
+        _prep_cache[key] = (data, (X, y_r, y_c))
+    return _prep_cache[key][1]
+
+
+# Fitted models are cached on disk, keyed on the estimator parameters, the training arrays and the library versions.
+# Least recently used fits are evicted once the cache grows past CACHE_BYTES_LIMIT, delete .cache/ to clear it.
+CACHE_BYTES_LIMIT = '500M'
+LIBRARY_VERSIONS = (sklearn.__version__, xgboost.__version__)
+memory = Memory('.cache', verbose=0)
+
+
+@memory.cache
+def fit_estimator(estimator, X, y, library_versions):
+    """
+        Fits the estimator on the given data, returning a cached fit when the same inputs were seen before.
+
+        Parameters:
+        estimator (object): The unfitted estimator.
+        X (numpy.ndarray): The feature matrix.
+        y (numpy.ndarray): The target array.
+        library_versions (tuple): The scikit-learn and XGBoost versions, so fits pickled by other versions
+            are not reused.
+
+        Returns:
+        object: The fitted estimator.
+        """
+    return estimator.fit(X, y)
+
+
+def fit_registered_casual(model, X, y_r, y_c):
+    """
+        Fits a copy of the model on both the registered and casual targets in parallel.
+
+        Parameters:
+        model (object): The model to fit, it is cloned and left unchanged.
+        X (numpy.ndarray): The feature matrix.
+        y_r (numpy.ndarray): The registered_log target.
+        y_c (numpy.ndarray): The casual_log target.
+
+        Returns:
+        sklearn.multioutput.MultiOutputRegressor: The fitted model predicting (registered_log, casual_log).
+        """
+    return fit_estimator(MultiOutputRegressor(clone(model), n_jobs=2), X, np.column_stack([y_r, y_c]),
+                         LIBRARY_VERSIONS)
+
+
+# Split once so every validation run reuses the same train/valid frames
+train, valid = custom_train_valid_split(train_df)
+# Actual validation counts, shared by every RMSLE evaluation below
+y_actual_valid_comb = np.expm1(valid['registered_log'].values) + np.expm1(valid['casual_log'].values)
 
 
 def predict_on_validation_set(model, input_cols):
@@ -434,65 +629,146 @@ def predict_on_validation_set(model, input_cols):
         Returns:
         float: The RMSLE score for the validation set predictions.
         """
-    train, valid = custom_train_valid_split(train_df)
     X_train, y_train_r, y_train_c = prep_train_data(train, input_cols)
-    X_valid, y_valid_r, y_valid_c = prep_train_data(valid, input_cols)
+    X_valid, _, _ = prep_train_data(valid, input_cols)
 
-    model_r = model.fit(X_train, y_train_r)
-    y_pred_r = np.exp(model_r.predict(X_valid)) - 1
+    # Fit registered and casual targets in parallel on the same feature matrix
+    model_rc = fit_registered_casual(model, X_train, y_train_r, y_train_c)
+    y_pred_rc = np.expm1(model_rc.predict(X_valid))
 
-    model_c = model.fit(X_train, y_train_c)
-    y_pred_c = np.exp(model_c.predict(X_valid)) - 1
+    y_pred_comb = np.round(y_pred_rc.sum(axis=1))
+    np.clip(y_pred_comb, 0, None, out=y_pred_comb)
 
-    y_pred_comb = np.round(y_pred_r + y_pred_c)
-    y_pred_comb[y_pred_comb < 0] = 0
+    rmsle = get_rmsle(y_pred_comb, y_actual_valid_comb)
+    return rmsle
 
-    y_actual_comb = np.exp(y_valid_r) + np.exp(y_valid_c) - 2
 
-    rmsle = get_rmsle(y_pred_comb, y_actual_comb)
-    return rmsle
+# Gradient boosting backend: 'xgboost' (default) or 'sklearn' for HistGradientBoostingRegressor
+GBM_BACKEND = os.environ.get('GBM_BACKEND', 'xgboost')
 
+# Each model builds its trees on 4 threads, the search runs one trial per 4 cores
+MODEL_N_JOBS = 4
+SEARCH_N_JOBS = max(1, (os.cpu_count() or 1) // MODEL_N_JOBS)
+N_TRIALS = 40
 
-# Define hyperparameter grids
-rf_param_grid = {
-    'n_estimators': [100, 200, 300],
-    'max_depth': [10, 15, 20],
-    'min_samples_split': [2, 5, 10],
-    'min_samples_leaf': [1, 2, 4],
-    'bootstrap': [True, False]
-}
 
-gbm_param_grid = {
-    'n_estimators': [100, 150, 200],
-    'max_depth': [3, 4, 5],
-    'min_samples_split': [2, 5, 10],
-    'min_samples_leaf': [1, 2, 4],
-    'learning_rate': [0.01, 0.05, 0.1],
-    'subsample': [0.8, 1.0]
-}
+# Define hyperparameter search spaces
+def suggest_rf_params(trial):
+    """
+        Samples a set of RandomForest hyperparameters for an Optuna trial.
+
+        Parameters:
+        trial (optuna.trial.Trial): The trial to sample from.
+
+        Returns:
+        dict: Keyword arguments for RandomForestRegressor.
+        """
+    return {
+        'n_estimators': trial.suggest_int('n_estimators', 100, 300, step=50),
+        'max_depth': trial.suggest_int('max_depth', 10, 20),
+        'min_samples_split': trial.suggest_int('min_samples_split', 2, 10),
+        'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 4),
+        'bootstrap': trial.suggest_categorical('bootstrap', [True, False])
+    }
+
+
+def suggest_gbm_params(trial):
+    """
+        Samples a set of gradient boosting hyperparameters for an Optuna trial, matching GBM_BACKEND.
+        Tree counts are upper bounds, early stopping picks the actual number of trees.
+
+        Parameters:
+        trial (optuna.trial.Trial): The trial to sample from.
+
+        Returns:
+        dict: Keyword arguments for the gradient boosting model.
+        """
+    if GBM_BACKEND == 'sklearn':
+        return {
+            'max_iter': trial.suggest_int('max_iter', 200, 500, step=100),
+            'max_depth': trial.suggest_int('max_depth', 3, 8),
+            'min_samples_leaf': trial.suggest_int('min_samples_leaf', 10, 40),
+            'learning_rate': trial.suggest_float('learning_rate', 1e-3, 0.3, log=True),
+            'l2_regularization': trial.suggest_float('l2_regularization', 1e-3, 10, log=True),
+            'max_bins': trial.suggest_categorical('max_bins', [63, 127, 255])
+        }
+    return {
+        'n_estimators': trial.suggest_int('n_estimators', 200, 1000, step=100),
+        'max_depth': trial.suggest_int('max_depth', 3, 12),
+        'learning_rate': trial.suggest_float('learning_rate', 1e-3, 0.3, log=True),
+        'subsample': trial.suggest_float('subsample', 0.6, 1.0),
+        'colsample_bytree': trial.suggest_float('colsample_bytree', 0.6, 1.0),
+        'min_child_weight': trial.suggest_int('min_child_weight', 1, 10),
+        'reg_alpha': trial.suggest_float('reg_alpha', 1e-3, 10, log=True),
+        'reg_lambda': trial.suggest_float('reg_lambda', 1e-3, 10, log=True),
+        'gamma': trial.suggest_float('gamma', 0, 0.5)
+    }
+
 
 # Define models
-rf_model = RandomForestRegressor(random_state=42)
-gbm_model = GradientBoostingRegressor(random_state=42)
-
-# Perform RandomizedSearchCV for hyperparameter tuning
-rf_random_search = RandomizedSearchCV(estimator=rf_model,
-                                      param_distributions=rf_param_grid,
-                                      n_iter=20,
-                                      scoring='neg_mean_squared_log_error',
-                                      cv=3,
-                                      verbose=2,
-                                      random_state=42,
-                                      n_jobs=-1)
-
-gbm_random_search = RandomizedSearchCV(estimator=gbm_model,
-                                       param_distributions=gbm_param_grid,
-                                       n_iter=20,
-                                       scoring='neg_mean_squared_log_error',
-                                       cv=3,
-                                       verbose=2,
-                                       random_state=42,
-                                       n_jobs=-1)
+def make_rf_model(params):
+    return RandomForestRegressor(random_state=42, n_jobs=MODEL_N_JOBS, **params)
+
+
+def make_gbm_model(params):
+    if GBM_BACKEND == 'sklearn':
+        return HistGradientBoostingRegressor(early_stopping=True, n_iter_no_change=20, random_state=42, **params)
+    return XGBRegressor(tree_method='hist', early_stopping_rounds=20, n_jobs=MODEL_N_JOBS, random_state=42,
+                        **params)
+
+
+def fit_model(model, X_train, y_train, X_eval, y_eval):
+    """
+        Fits the model, passing the evaluation set for XGBoost early stopping.
+        HistGradientBoostingRegressor early-stops on its own internal validation fraction instead.
+
+        Parameters:
+        model (object): The model to fit.
+        X_train, y_train (array-like): The training data.
+        X_eval, y_eval (array-like): The evaluation data used for early stopping.
+
+        Returns:
+        object: The fitted model.
+        """
+    if isinstance(model, XGBRegressor):
+        return model.fit(X_train, y_train, eval_set=[(X_eval, y_eval)], verbose=False)
+    return model.fit(X_train, y_train)
+
+
+def cv_objective(trial, model, X, y):
+    """
+        Scores an Optuna trial by 3-fold cross-validated mean squared log error.
+        The running mean is reported after every fold so the pruner can stop unpromising trials early.
+        XGBoost early-stops on a split of each fold's training rows, never on the fold it is scored on.
+
+        Parameters:
+        trial (optuna.trial.Trial): The trial being evaluated.
+        model (object): The unfitted model built from the trial's parameters.
+        X (pandas.DataFrame): The feature matrix.
+        y (pandas.Series): The target variable.
+
+        Returns:
+        float: The mean squared log error averaged over the folds.
+        """
+    errors = []
+    for fold, (train_idx, valid_idx) in enumerate(KFold(n_splits=3).split(X)):
+        X_fold_train, X_fold_valid = X.iloc[train_idx], X.iloc[valid_idx]
+        y_fold_train, y_fold_valid = y.iloc[train_idx], y.iloc[valid_idx]
+        if isinstance(model, XGBRegressor):
+            # Early-stop on part of the fold's training rows, the held-out fold is only used for scoring
+            X_fit, X_stop, y_fit, y_stop = train_test_split(X_fold_train, y_fold_train, test_size=0.2,
+                                                            random_state=42)
+        else:
+            X_fit, y_fit, X_stop, y_stop = X_fold_train, y_fold_train, None, None
+        fold_model = fit_model(clone(model), X_fit, y_fit, X_stop, y_stop)
+        y_fold_pred = np.clip(fold_model.predict(X_fold_valid), 0, None)
+        errors.append(mean_squared_log_error(y_fold_valid, y_fold_pred))
+
+        trial.report(np.mean(errors), fold)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return np.mean(errors)
+
 
 # Define feature columns
 rf_cols = [
@@ -516,37 +792,63 @@ y_gbm = train_df['count_log']
 X_train_rf, X_valid_rf, y_train_rf, y_valid_rf = train_test_split(X_rf, y_rf, test_size=0.2, random_state=42)
 X_train_gbm, X_valid_gbm, y_train_gbm, y_valid_gbm = train_test_split(X_gbm, y_gbm, test_size=0.2, random_state=42)
 
-# Fit the random search models
-rf_random_search.fit(X_train_rf, y_train_rf)
-gbm_random_search.fit(X_train_gbm, y_train_gbm)
-
-print("Best parameters for RandomForest: ", rf_random_search.best_params_)
-print("Best parameters for GradientBoosting: ", gbm_random_search.best_params_)
-
-
-# Get the best models from the random search
-best_rf_model = rf_random_search.best_estimator_
-best_gbm_model = gbm_random_search.best_estimator_
+# Tune hyperparameters with Optuna's TPE sampler, pruning trials that fall behind the median
+rf_study = optuna.create_study(direction='minimize', sampler=optuna.samplers.TPESampler(seed=42),
+                               pruner=optuna.pruners.MedianPruner())
+rf_study.optimize(lambda trial: cv_objective(trial, make_rf_model(suggest_rf_params(trial)), X_train_rf, y_train_rf),
+                  n_trials=N_TRIALS, n_jobs=SEARCH_N_JOBS)
+
+gbm_study = optuna.create_study(direction='minimize', sampler=optuna.samplers.TPESampler(seed=42),
+                                pruner=optuna.pruners.MedianPruner())
+gbm_study.optimize(lambda trial: cv_objective(trial, make_gbm_model(suggest_gbm_params(trial)),
+                                              X_train_gbm, y_train_gbm),
+                   n_trials=N_TRIALS, n_jobs=SEARCH_N_JOBS)
+
+print("Best parameters for RandomForest: ", rf_study.best_params)
+print("Best parameters for GradientBoosting: ", gbm_study.best_params)
+
+
+# Fit the best models on the search training split
+best_rf_model = make_rf_model(rf_study.best_params).fit(X_train_rf, y_train_rf)
+best_gbm_model = fit_model(make_gbm_model(gbm_study.best_params), X_train_gbm, y_train_gbm, X_valid_gbm, y_valid_gbm)
+# Freeze the early-stopped tree count so later refits don't need an eval set
+if GBM_BACKEND == 'sklearn':
+    best_gbm_model.set_params(max_iter=best_gbm_model.n_iter_, early_stopping=False)
+else:
+    best_gbm_model.set_params(n_estimators=best_gbm_model.best_iteration + 1, early_stopping_rounds=None)
+
+# Feature importance
+def plot_feature_importances(model, input_cols, title, X_eval, y_eval):
+    """
+        Plots the feature importances of a fitted model as a sorted bar chart.
 
-# Feature importance for RandomForest
-rf_importances = best_rf_model.feature_importances_
-rf_importance_df = pd.DataFrame({'feature': rf_cols, 'importance': rf_importances}).sort_values(by='importance',
-                                                                                                ascending=False)
+        Parameters:
+        model (object): The fitted model.
+        input_cols (list): The feature columns the model was trained on.
+        title (str): The plot title.
+        X_eval, y_eval (array-like): Held-out data for permutation importance, used when the model has no
+            impurity-based importances (HistGradientBoostingRegressor).
 
-plt.figure(figsize=(12, 8))
-sns.barplot(x='importance', y='feature', data=rf_importance_df)
-plt.title('Random Forest Feature Importance')
-plt.show()
+        Returns:
+        None: Displays the plot using matplotlib.
+        """
+    if hasattr(model, 'feature_importances_'):
+        importances = model.feature_importances_
+    else:
+        importances = permutation_importance(model, X_eval, y_eval, n_repeats=5, random_state=42).importances_mean
+    importance_df = pd.DataFrame({'feature': input_cols, 'importance': importances}).sort_values(by='importance',
+                                                                                              ascending=False)
+
+    plt.figure(figsize=(12, 8))
+    sns.barplot(x='importance', y='feature', data=importance_df)
+    plt.title(title)
+    plt.show()
 
-# Feature importance for GradientBoosting
-gbm_importances = best_gbm_model.feature_importances_
-gbm_importance_df = pd.DataFrame({'feature': gbm_cols, 'importance': gbm_importances}).sort_values(by='importance',
-                                                                                                   ascending=False)
 
-plt.figure(figsize=(12, 8))
-sns.barplot(x='importance', y='feature', data=gbm_importance_df)
-plt.title('Gradient Boosting Feature Importance')
-plt.show()
+if EDA:
+    plot_feature_importances(best_rf_model, rf_cols, 'Random Forest Feature Importance', X_valid_rf, y_valid_rf)
+    plot_feature_importances(best_gbm_model, gbm_cols, 'Gradient Boosting Feature Importance',
+                             X_valid_gbm, y_valid_gbm)
 
 
 """
@@ -567,20 +869,16 @@ for clf_index, (input_cols, clf) in enumerate(zip(clf_input_cols, clfs)):
     X_test = test_df[input_cols].values
 
     # Predict for both registered and casual users, blend the predictions
-    model_r = clf.fit(X_train, y_train_r)
-    y_pred_train_r = np.exp(model_r.predict(X_train)) - 1
-    y_pred_test_r = np.exp(model_r.predict(X_test)) - 1
-
-    model_c = clf.fit(X_train, y_train_c)
-    y_pred_train_c = np.exp(model_c.predict(X_train)) - 1
-    y_pred_test_c = np.exp(model_c.predict(X_test)) - 1
+    model_rc = fit_registered_casual(clf, X_train, y_train_r, y_train_c)
+    y_pred_train_rc = np.expm1(model_rc.predict(X_train))
+    y_pred_test_rc = np.expm1(model_rc.predict(X_test))
 
     # Combine predictions and ensure non-negative predictions
-    y_pred_train_comb = np.round(y_pred_train_r + y_pred_train_c)
-    y_pred_train_comb[y_pred_train_comb < 0] = 0
+    y_pred_train_comb = np.round(y_pred_train_rc.sum(axis=1))
+    np.clip(y_pred_train_comb, 0, None, out=y_pred_train_comb)
 
-    y_pred_test_comb = np.round(y_pred_test_r + y_pred_test_c)
-    y_pred_test_comb[y_pred_test_comb < 0] = 0
+    y_pred_test_comb = np.round(y_pred_test_rc.sum(axis=1))
+    np.clip(y_pred_test_comb, 0, None, out=y_pred_test_comb)
 
     # Store the blended predictions
     blend_train[:, clf_index] = y_pred_train_comb
@@ -620,33 +918,32 @@ sns.barplot(x='Model', y='RMSLE', data=performance_df)
 plt.title('Model Performances Comparison')
 plt.ylabel('RMSLE Score')
 plt.savefig('model_performance_comparison.png')
-plt.show()
+if EDA:
+    plt.show()
 
 # Calculate RMSLE for Blended Model
-train, valid = custom_train_valid_split(train_df)
 blend_valid = np.zeros((valid.shape[0], len(clfs)))
 
 for clf_index, (input_cols, clf) in enumerate(zip(clf_input_cols, clfs)):
     X_train, y_train_r, y_train_c = prep_train_data(train_df, input_cols)
-    X_valid, y_valid_r, y_valid_c = prep_train_data(valid, input_cols)
+    X_valid, _, _ = prep_train_data(valid, input_cols)
 
-    model_r = clf.fit(X_train, y_train_r)
-    y_pred_valid_r = np.exp(model_r.predict(X_valid)) - 1
+    model_rc = fit_registered_casual(clf, X_train, y_train_r, y_train_c)
+    y_pred_valid_rc = np.expm1(model_rc.predict(X_valid))
 
-    model_c = clf.fit(X_train, y_train_c)
-    y_pred_valid_c = np.exp(model_c.predict(X_valid)) - 1
-
-    y_pred_valid_comb = np.round(y_pred_valid_r + y_pred_valid_c)
-    y_pred_valid_comb[y_pred_valid_comb < 0] = 0
+    y_pred_valid_comb = np.round(y_pred_valid_rc.sum(axis=1))
+    np.clip(y_pred_valid_comb, 0, None, out=y_pred_valid_comb)
 
     blend_valid[:, clf_index] = y_pred_valid_comb
 
 y_pred_blend_valid = np.round(bclf.predict(blend_valid)).astype(int)
-y_actual_valid_comb = np.exp(y_valid_r) + np.exp(y_valid_c) - 2
 
 blend_rmsle = get_rmsle(y_pred_blend_valid, y_actual_valid_comb)
 print(f"RMSLE Score for Blended Model: {blend_rmsle}")
 
+# Keep the model cache bounded across runs
+memory.reduce_size(bytes_limit=CACHE_BYTES_LIMIT)
+
 #Best parameters for RandomForest:  {'n_estimators': 100, 'min_samples_split': 5, 'min_samples_leaf': 2, 'max_depth': 20, 'bootstrap': True}
 #Best parameters for GradientBoosting:  {'subsample': 0.8, 'n_estimators': 200, 'min_samples_split': 10, 'min_samples_leaf': 1, 'max_depth': 5, 'learning_rate': 0.1}
 #RMSLE Score for RandomForest: 0.4408788410629949